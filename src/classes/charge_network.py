@@ -2,14 +2,89 @@
 Defines the ChargeNetwork class and related exceptions.
 """
 import datetime
-import json
+import heapq
 import math
-from queue import PriorityQueue
-from typing import Self
+from dataclasses import dataclass
+from typing import Iterable, KeysView, Optional, Self
+
+import numpy as np
+import orjson
 
 from classes.charge_station import ChargeStation
 from classes.leg import Leg
-from utils.calcs import great_circle_distance
+from utils.calcs import great_circle_distances_to_point, pairs_within_distance
+
+
+@dataclass
+class _StationArrays:
+    """
+    The charge stations of a ChargeNetwork in a fixed order, along with their coordinates in parallel arrays
+    so that calculations over every charge station can be vectorized.
+
+    Every array is read-only, since it is shared by everything that uses this cache.
+
+    Instance Attributes:
+        - stations: every charge station in the network, in the order of ChargeNetwork.charge_stations()
+        - coords: an array of shape (len(stations), 2) where row i is the coord of stations[i]
+        - lat_rads: the lat_rad of each charge station
+        - lng_rads: the lng_rad of each charge station
+        - cos_lats: the cos_lat of each charge station
+
+    Representation Invariants:
+        - coords.shape == (len(stations), 2)
+        - len(lat_rads) == len(lng_rads) == len(cos_lats) == len(stations)
+    """
+    stations: list[ChargeStation]
+    coords: np.ndarray
+    lat_rads: np.ndarray
+    lng_rads: np.ndarray
+    cos_lats: np.ndarray
+
+
+@dataclass
+class _CompactGraph:
+    """
+    A compressed sparse row (CSR) representation of the graph of a ChargeNetwork, used for path finding.
+
+    Charge stations are identified by their index in stations, and their coordinates are also stored in
+    parallel arrays so that the heuristic can be computed for every charge station at once.
+    The legs of the charge station with index i are stored at positions offsets[i] up to (but not including)
+    offsets[i + 1] of neighbours, driving_distances, and legs, so iterating over them only walks contiguous
+    list positions.
+
+    Instance Attributes:
+        - stations: every charge station in the graph
+        - index: maps each charge station to its index in stations
+        - lat_rads: the lat_rad of each charge station
+        - lng_rads: the lng_rad of each charge station
+        - cos_lats: the cos_lat of each charge station
+        - offsets: the position of the first leg of each charge station, followed by the total number of positions
+        - neighbours: the index of the other endpoint of the leg at each position
+        - driving_distances: the driving_distance of the leg at each position
+        - legs: the leg at each position
+        - min_detour_ratio: the lowest ratio of driving_distance to great circle distance (in meters) of any leg,
+                            or 1 if there are no such legs
+        - landmark_distances: the driving distance from each landmark (row) to each charge station (column),
+                              or None if landmarks have not been precomputed
+
+    Representation Invariants:
+        - len(lat_rads) == len(lng_rads) == len(cos_lats) == len(stations)
+        - len(offsets) == len(stations) + 1
+        - len(neighbours) == len(driving_distances) == len(legs) == offsets[-1]
+        - min_detour_ratio >= 0
+        - landmark_distances is None or landmark_distances.shape[1] == len(stations)
+    """
+    stations: list[ChargeStation]
+    index: dict[ChargeStation, int]
+    lat_rads: np.ndarray
+    lng_rads: np.ndarray
+    cos_lats: np.ndarray
+    offsets: list[int]
+    neighbours: list[int]
+    driving_distances: list[int]
+    legs: list[Leg]
+    min_detour_ratio: float
+    landmark_distances: Optional[np.ndarray] = None
 
 
 class ChargeNetwork:
@@ -30,15 +105,24 @@ class ChargeNetwork:
     """
     # Private Instance Attributes:
     #   - _graph: a dict of charge stations and corresponding legs
+    #   - _compact_graph: a cached CSR representation of _graph used for path finding,
+    #                     or None if _graph has changed since it was last built
+    #   - _station_arrays: the cached charge stations in _graph and their coordinate arrays, shared by
+    #                      coords_array, get_closest_charge_station, and _compact_graph,
+    #                      or None if a charge station has been added since it was last built
     _min_chargers_at_station: int
     _ev_range: int
-    _graph: dict[ChargeStation, set[Leg]]
+    _graph: dict[ChargeStation, list[Leg]]
+    _compact_graph: Optional[_CompactGraph]
+    _station_arrays: Optional[_StationArrays]
 
     def __init__(self, min_chargers_at_station: int, ev_range: int) -> None:
         """Initializes an empty graph."""
         self._min_chargers_at_station = min_chargers_at_station
         self._ev_range = ev_range
         self._graph = {}
+        self._compact_graph = None
+        self._station_arrays = None
 
     @property
     def min_chargers_at_station(self) -> int:
@@ -50,22 +134,58 @@ class ChargeNetwork:
         """A getter for self._ev_range."""
         return self._ev_range
 
-    def charge_stations(self) -> set[ChargeStation]:
-        """Returns a set of charge stations in the charge network."""
-        return set(self._graph.keys())
+    def charge_stations(self) -> KeysView[ChargeStation]:
+        """
+        Returns a read-only view of the charge stations in the charge network.
+
+        The view reflects later changes to the network, so callers that need a
+        separate collection should copy it (e.g. with set or list).
+        """
+        return self._graph.keys()
+
+    def coords_array(self) -> np.ndarray:
+        """
+        Returns a read-only array of shape (n, 2) where row i is the (lat, lng) of the charge station at
+        position i of self.charge_stations().
+
+        The array is cached until a charge station is added, so repeated calls do not walk the charge stations.
+        """
+        return self._get_station_arrays().coords
+
+    def _get_station_arrays(self) -> _StationArrays:
+        """
+        Returns the charge stations of self._graph and their coordinate arrays,
+        building them first if they are not already cached.
+        """
+        if self._station_arrays is None:
+            stations = list(self._graph)
+            coords = np.fromiter((coord for cs in stations for coord in cs.coord),
+                                 dtype=float, count=2 * len(stations)).reshape(-1, 2)
+            lat_rads = np.fromiter((cs.lat_rad for cs in stations), dtype=float, count=len(stations))
+            lng_rads = np.fromiter((cs.lng_rad for cs in stations), dtype=float, count=len(stations))
+            cos_lats = np.fromiter((cs.cos_lat for cs in stations), dtype=float, count=len(stations))
+
+            for array in (coords, lat_rads, lng_rads, cos_lats):
+                array.setflags(write=False)
+
+            self._station_arrays = _StationArrays(stations, coords, lat_rads, lng_rads, cos_lats)
+
+        return self._station_arrays
 
     @classmethod
     def from_json(cls, filepath: str) -> Self:
         """Creates a ChargeNetwork object by unpacking the JSON file created by the export_to_json method."""
-        with open(filepath, 'r') as file:
-            data = json.load(file)
+        with open(filepath, 'rb') as file:
+            data = orjson.loads(file.read())
 
         min_chargers_at_station = data['min_chargers_at_station']
         ev_range = data['ev_range']
 
         network = cls(min_chargers_at_station, ev_range)
 
-        # create all charge_stations
+        charge_stations_data = data['_graph']['charge_stations']
+
+        # create all charge_stations (open dates are exported as YYYY-MM-DD, or None if missing)
         charge_stations = {
             int(id): ChargeStation(
                 cs['name'],
@@ -74,24 +194,24 @@ class ChargeNetwork:
                 cs['phone'],
                 cs['lat'],
                 cs['lng'],
-                datetime.datetime.strptime(cs['open_date'], '%Y-%m-%d').date() if cs['open_date'] else None
+                datetime.date.fromisoformat(cs['open_date']) if cs['open_date'] else None
             )
-            for id, cs in data['_graph']['charge_stations'].items()
+            for id, cs in charge_stations_data.items()
         }
 
-        # create set of all legs
-        legs = {
+        # create list of all legs (the exported legs are already unique, so they do not need to be hashed into a set)
+        legs = [
             Leg(
                 charge_stations[leg['endpoint_ids'][0]],
                 charge_stations[leg['endpoint_ids'][1]],
                 leg['driving_distance'],
                 leg['driving_time']
             )
-            for leg in data['_graph']['legs']}
+            for leg in data['_graph']['legs']
+        ]
 
         # add charge stations to graph
-        for cs in charge_stations.values():
-            network.add_charge_station(cs)
+        network.add_charge_stations(charge_stations.values())
 
         # add edges to graph
         network.safe_load_legs(legs)
@@ -116,14 +236,19 @@ class ChargeNetwork:
             for cs in self._graph.keys()
         }
 
-        legs = [
-            {
-                'endpoint_ids': [id(e) for e in leg.endpoints],
-                'driving_distance': leg.driving_distance,
-                'driving_time': leg.driving_time
-            }
-            for leg in set.union(*self._graph.values())  # removes duplicates since legs are equal if endpoints equal
-        ]
+        # each leg is in the leg set of both of its endpoints, so it is only written the first time it is seen
+        legs = []
+        seen_legs = set()
+        for leg_set in self._graph.values():
+            for leg in leg_set:
+                if leg not in seen_legs:
+                    seen_legs.add(leg)
+                    cs1, cs2 = leg.endpoints
+                    legs.append({
+                        'endpoint_ids': [id(cs1), id(cs2)],
+                        'driving_distance': leg.driving_distance,
+                        'driving_time': leg.driving_time
+                    })
 
         data = {
             'min_chargers_at_station': self.min_chargers_at_station,
@@ -136,29 +261,51 @@ class ChargeNetwork:
 
         print(f'exporting network with {len(charge_stations)} charge stations and {len(legs)} legs to json')
 
-        with open(filepath, 'w') as file:
-            json.dump(data, file, indent=4)
+        # charge station ids are ints, which orjson only serializes as keys with OPT_NON_STR_KEYS;
+        # the file is only read back by from_json, so it is written compactly without indentation
+        with open(filepath, 'wb') as file:
+            file.write(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
 
-    def charge_station_legs(self, cs: ChargeStation) -> set[Leg]:
+    def charge_station_legs(self, cs: ChargeStation) -> list[Leg]:
         """
-        Returns a set of legs that contain the given charge station in the charge network.
+        Returns a list of legs that contain the given charge station in the charge network.
 
         Preconditions
             - charge_station in self._graph
         """
         return self._graph[cs]
 
-    def add_charge_station(self, cs: ChargeStation, legs: set[Leg] = None) -> None:
+    def add_charge_station(self, cs: ChargeStation, legs: Iterable[Leg] = None) -> None:
         """
-        Adds a charge station (and optionally a corresponding set of legs) to the graph.
+        Adds a charge station (and optionally a corresponding collection of legs) to the graph.
 
         Preconditions:
             - station not in self._graph
+            - legs contains no duplicates
          """
         if legs:
-            self._graph[cs] = legs
+            self._graph[cs] = list(legs)
         else:
-            self._graph[cs] = set()
+            self._graph[cs] = []
+
+        self._compact_graph = None
+        self._station_arrays = None
+
+    def add_charge_stations(self, charge_stations: Iterable[ChargeStation]) -> None:
+        """
+        Adds each of the given charge stations to the graph without any legs.
+
+        This is the same as calling add_charge_station on each charge station,
+        but updates the graph in one call instead of once per charge station.
+
+        Preconditions:
+            - all(cs not in self._graph for cs in charge_stations)
+            - charge_stations contains no duplicates
+        """
+        self._graph.update((cs, []) for cs in charge_stations)
+
+        self._compact_graph = None
+        self._station_arrays = None
 
     def get_possible_legs(self) -> set[Leg]:
         """
@@ -168,31 +315,120 @@ class ChargeNetwork:
         endpoints in less than self.ev_range. This is because a road distance between two
         charge stations will always be more than a great circle distance between two charge stations.
         """
-        result = set()
+        station_arrays = self._get_station_arrays()
+        all_charge_stations, coords = station_arrays.stations, station_arrays.coords
 
-        all_charge_stations = self.charge_stations()
+        i_indices, j_indices = pairs_within_distance(coords[:, 0], coords[:, 1], self.ev_range)
 
-        for i in all_charge_stations:
-            for j in all_charge_stations:
-                if i is not j and great_circle_distance(i.coord, j.coord) < self.ev_range:
-                    edge = Leg(i, j)
-                    if edge not in result:
-                        result.add(edge)
-
-        return result
+        return {
+            Leg(all_charge_stations[i], all_charge_stations[j])
+            for i, j in zip(i_indices.tolist(), j_indices.tolist())
+        }
 
-    def safe_load_legs(self, legs: set[Leg]) -> None:
+    def safe_load_legs(self, legs: Iterable[Leg]) -> None:
         """
-        Takes a set of legs and mutates self by associating each leg with its 2 endpoints
+        Takes an iterable of legs and mutates self by associating each leg with its 2 endpoints
         if its driving_distance is valid for this network.
 
+        Legs are stored in a list for each charge station rather than a set, since each leg is only
+        associated with each of its endpoints once and lists are cheaper to build and iterate.
+
         Preconditions:
             - all endpoints in all charge stations are in self
+            - legs contains no duplicates and no leg already in self
         """
         for leg in legs:
             if leg.driving_distance <= self.ev_range * 1000:
                 for cs in leg.endpoints:
-                    self._graph[cs].add(leg)
+                    self._graph[cs].append(leg)
+
+        self._compact_graph = None
+
+    def _get_compact_graph(self) -> _CompactGraph:
+        """Returns a CSR representation of self._graph, building it first if it is not already cached."""
+        if self._compact_graph is None:
+            # the charge stations and their coordinate arrays are shared with the station arrays cache
+            station_arrays = self._get_station_arrays()
+            stations = station_arrays.stations
+            index = {cs: i for i, cs in enumerate(stations)}
+            lat_rads, lng_rads, cos_lats = station_arrays.lat_rads, station_arrays.lng_rads, station_arrays.cos_lats
+
+            offsets = [0]
+            neighbours = []
+            driving_distances = []
+            legs = []
+            for cs in stations:
+                for leg in self._graph[cs]:
+                    neighbours.append(index[leg.get_other_endpoint(cs)])
+                    driving_distances.append(leg.driving_distance)
+                    legs.append(leg)
+                offsets.append(len(legs))
+
+            self._compact_graph = _CompactGraph(stations, index, lat_rads, lng_rads, cos_lats,
+                                                offsets, neighbours, driving_distances, legs,
+                                                _min_detour_ratio(lat_rads, lng_rads, cos_lats,
+                                                                  offsets, neighbours, driving_distances))
+
+        return self._compact_graph
+
+    def precompute_landmarks(self, num_landmarks: int = 16) -> None:
+        """
+        Picks num_landmarks charge stations as landmarks and stores the driving distance from each landmark
+        to every charge station, which get_shortest_path then uses to tighten its heuristic.
+
+        By the triangle inequality, abs(d(landmark, v) - d(landmark, target)) is a lower bound on the
+        driving distance between v and target for every landmark, and it stays a lower bound when
+        get_shortest_path ignores legs outside of its length criteria since that only makes paths longer.
+
+        Landmarks are picked by farthest-first traversal, where each new landmark is the charge station
+        furthest by driving distance from all landmarks picked so far (preferring unreachable charge stations).
+
+        The landmarks are discarded whenever the charge stations or legs of this network change.
+
+        This is a mutating method.
+
+        Preconditions:
+            - num_landmarks >= 1
+        """
+        graph = self._get_compact_graph()
+        if not graph.stations:
+            return
+
+        landmark_distances = []
+        closest_landmark_distances = np.full(len(graph.stations), math.inf)
+        landmark = 0
+
+        for _ in range(min(num_landmarks, len(graph.stations))):
+            distances = np.array(_driving_distances_from(graph, landmark))
+            landmark_distances.append(distances)
+            np.minimum(closest_landmark_distances, distances, out=closest_landmark_distances)
+
+            if np.isinf(closest_landmark_distances).any():
+                landmark = int(np.isinf(closest_landmark_distances).argmax())
+            else:
+                landmark = int(closest_landmark_distances.argmax())
+
+        graph.landmark_distances = np.array(landmark_distances)
+
+    def get_closest_charge_station(self, coord: tuple[float, float]) -> ChargeStation:
+        """
+        Returns the charge station in this network with the lowest great circle distance to coord.
+
+        The distances to every charge station are computed in one vectorized call
+        using the cached coordinate arrays of the charge stations.
+
+        Preconditions:
+            - len(self.charge_stations()) >= 1
+            - -90 <= coord[0] <= 90
+            - -180 <= coord[1] <= 180
+        """
+        station_arrays = self._get_station_arrays()
+        lat_rad = math.radians(coord[0])
+        lng_rad = math.radians(coord[1])
+
+        distances = great_circle_distances_to_point(station_arrays.lat_rads, station_arrays.lng_rads,
+                                                    station_arrays.cos_lats, lat_rad, lng_rad, math.cos(lat_rad))
+        return station_arrays.stations[int(distances.argmin())]
 
     def get_shortest_path(self,
                           cs1: ChargeStation,
@@ -200,10 +436,15 @@ class ChargeNetwork:
                           min_leg_length: float,
                           max_leg_length: float) -> list[Leg]:
         """
-        Implements A* search algorithm to return the shortest path by driving distance
+        Implements bidirectional A* search algorithm to return the shortest path by driving distance
         using great circle distance as heuristic since great circle distance
         will always be less than the actual shortest path (admissible and consistent).
 
+        A forward search from cs1 and a backward search from cs2 are run at the same time, always expanding
+        the side whose fringe has the lower f_score, until no path through the fringes can beat the shortest
+        path found where the searches meet. Both searches use the average of the heuristic towards cs2 and
+        the negated heuristic towards cs1, which keeps their f_scores comparable and the search optimal.
+
         Returns a list of legs leading from cs1 to cs2 if a path is found.
 
         Raises PathNotFound or PathNotNeeded.
@@ -221,51 +462,202 @@ class ChargeNetwork:
         min_leg_length *= 1000  # todo convert all distances to meters
         max_leg_length *= 1000
 
-        # fringe contains tuple of 3 values
+        graph = self._get_compact_graph()
+        offsets, neighbours, driving_distances = graph.offsets, graph.neighbours, graph.driving_distances
+
+        start = graph.index[cs1]
+        end = graph.index[cs2]
+
+        # the heuristics for every charge station are computed in one vectorized call each instead of once
+        # per relaxation, and converted to lists so that each lookup in the loop is a plain float;
+        # great circle distances are in kilometers, so they are converted to meters like driving distances
+        # and scaled by the lowest detour ratio of any leg, which keeps them a lower bound on any path
+        heuristic_scale = 1000 * graph.min_detour_ratio
+        to_end = heuristic_scale * great_circle_distances_to_point(
+            graph.lat_rads, graph.lng_rads, graph.cos_lats, cs2.lat_rad, cs2.lng_rad, cs2.cos_lat
+        )
+        to_start = heuristic_scale * great_circle_distances_to_point(
+            graph.lat_rads, graph.lng_rads, graph.cos_lats, cs1.lat_rad, cs1.lng_rad, cs1.cos_lat
+        )
+        if graph.landmark_distances is not None:
+            to_end = np.maximum(to_end, _landmark_lower_bounds(graph.landmark_distances, end))
+            to_start = np.maximum(to_start, _landmark_lower_bounds(graph.landmark_distances, start))
+
+        forward_heuristic = ((to_end - to_start) / 2).tolist()
+        backward_heuristic = ((to_start - to_end) / 2).tolist()
+        to_end = to_end.tolist()
+        to_start = to_start.tolist()
+
+        # each fringe contains tuple of 3 values
         #     - index 0 is f_score
         #     - index 1 is a decreasing counter to ensure LIFO tie breaks and that remaining elements are never compared
-        #     - index 2 is the charge station
-        fringe = PriorityQueue()
+        #     - index 2 is the index of the charge station in graph
+        # fringes are plain lists used as heaps through heapq
         lifo_counter = -1
-        fringe.put((0, lifo_counter, cs1))
+        forward_fringe = [(forward_heuristic[start], lifo_counter, start)]
+        backward_fringe = [(backward_heuristic[end], lifo_counter, end)]
+
+        # for node n, prev_legs[n] is the position in graph of the leg leading to n
+        # in the shortest path currently known to n from the start of that search
+        forward_prev_legs = {}
+        backward_prev_legs = {}
+
+        # g_score and f_score are dense lists indexed by charge station, where charge stations
+        # that have not been reached yet have a score of infinity
+        forward_g_score = [math.inf] * len(graph.stations)
+        forward_f_score = [math.inf] * len(graph.stations)
+        backward_g_score = [math.inf] * len(graph.stations)
+        backward_f_score = [math.inf] * len(graph.stations)
+        forward_g_score[start] = 0
+        forward_f_score[start] = forward_heuristic[start]
+        backward_g_score[end] = 0
+        backward_f_score[end] = backward_heuristic[end]
+
+        # the state of each search, indexed by whether it is the backward search, along with
+        # the lower bound on the distance left to the other end and the g_score of the opposite search
+        searches = (
+            (forward_fringe, forward_prev_legs, forward_g_score, forward_f_score,
+             forward_heuristic, to_end, backward_g_score),
+            (backward_fringe, backward_prev_legs, backward_g_score, backward_f_score,
+             backward_heuristic, to_start, forward_g_score)
+        )
+
+        # the length of the shortest path found so far and the charge station where its two halves meet
+        shortest_length = math.inf
+        meeting_point = None
+
+        while forward_fringe and backward_fringe:
+            if forward_fringe[0][0] + backward_fringe[0][0] >= shortest_length:
+                break  # no path through either fringe can be shorter than the one already found
+
+            fringe, prev_legs, g_score, f_score, heuristic, remaining, other_g_score = \
+                searches[forward_fringe[0][0] > backward_fringe[0][0]]
+
+            curr_f_score, _, curr = heapq.heappop(fringe)
+
+            # a charge station is pushed again whenever a shorter path to it is found, so entries
+            # with a worse f_score than the best known one are stale and skipped instead of removed
+            if curr_f_score > f_score[curr]:
+                continue
+
+            curr_g_score = g_score[curr]
+
+            for k in range(offsets[curr], offsets[curr + 1]):
+                driving_distance = driving_distances[k]
+
+                if driving_distance < min_leg_length or driving_distance > max_leg_length:
+                    continue  # ignore legs that do not fit length criteria
 
-        # for node n, prev_legs[n] is the leg leading to n in the shortest path currently known to n
-        prev_legs = {}
+                neighbour = neighbours[k]
+                temp_g_score = curr_g_score + driving_distance
 
-        g_score = {cs: math.inf for cs in self.charge_stations()}
-        g_score[cs1] = 0
+                if temp_g_score < g_score[neighbour]:
+                    prev_legs[neighbour] = k
+                    g_score[neighbour] = temp_g_score
+                    f_score[neighbour] = temp_g_score + heuristic[neighbour]
 
-        while not fringe.empty():
-            curr = fringe.get()
-            curr_cs = curr[2]
+                    if temp_g_score + other_g_score[neighbour] < shortest_length:
+                        shortest_length = temp_g_score + other_g_score[neighbour]
+                        meeting_point = neighbour
 
-            if curr_cs is cs2:
-                return self._reconstruct_path(prev_legs, cs2)
+                    # a charge station is only worth expanding if a path through it could still
+                    # be shorter than the shortest path found so far
+                    if temp_g_score + remaining[neighbour] < shortest_length:
+                        heapq.heappush(fringe, (f_score[neighbour], lifo_counter, neighbour))
+                        lifo_counter -= 1
 
-            for leg in self.charge_station_legs(curr_cs):
+        if meeting_point is None:
+            raise PathNotFound
 
-                if leg.driving_distance < min_leg_length or leg.driving_distance > max_leg_length:
-                    continue  # ignore legs that do not fit length criteria
+        backward_path = self._reconstruct_path(graph, backward_prev_legs, meeting_point)
+        backward_path.reverse()
+        return self._reconstruct_path(graph, forward_prev_legs, meeting_point) + backward_path
+
+    def _reconstruct_path(self, graph: _CompactGraph, prev_legs: dict[int, int], end: int) -> list[Leg]:
+        """
+        Returns a list of legs leading from the start charge station in prev_legs to end,
+        where charge stations and legs are identified by their index and position in graph.
+        """
+        path = []
+        while end in prev_legs:
+            leg = graph.legs[prev_legs[end]]
+            path.append(leg)
+            end = graph.index[leg.get_other_endpoint(graph.stations[end])]
+
+        path.reverse()
+        return path
+
+
+def _min_detour_ratio(lat_rads: np.ndarray,
+                      lng_rads: np.ndarray,
+                      cos_lats: np.ndarray,
+                      offsets: list[int],
+                      neighbours: list[int],
+                      driving_distances: list[int]) -> float:
+    """
+    Returns the lowest ratio of driving distance to great circle distance (in meters) of any leg in the given
+    CSR representation, or 1 if there are no legs between charge stations at different coordinates.
+
+    Since every leg is at least this many times longer than the great circle distance between its endpoints,
+    so is every path, which makes the scaled great circle distance an admissible and consistent heuristic.
+    Without bad data the ratio is at least 1, but it is computed rather than assumed so that the heuristic
+    stays admissible either way. A leg with a driving distance of 0 between different coordinates makes the
+    ratio 0, which turns the heuristic off rather than making it inadmissible.
+    """
+    starts = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    ends = np.array(neighbours, dtype=int)
 
-                neighbour = leg.get_other_endpoint(curr_cs)
+    great_circle_distances = 1000 * great_circle_distances_to_point(
+        lat_rads[starts], lng_rads[starts], cos_lats[starts], lat_rads[ends], lng_rads[ends], cos_lats[ends]
+    )
 
-                # since our heuristic is admissible and consistent, we will only need to
-                # calculate g_score and add to fringe once per charge station
-                if g_score[neighbour] == math.inf:
-                    prev_legs[neighbour] = leg
-                    g_score[neighbour] = g_score[curr_cs] + leg.driving_distance
-                    f_score = g_score[neighbour] + great_circle_distance(neighbour.coord, cs2.coord)
-                    fringe.put((f_score, lifo_counter, neighbour))
-                    lifo_counter -= 1
+    nonzero = great_circle_distances > 0
+    if not nonzero.any():
+        return 1
 
-        raise PathNotFound
+    return float((np.array(driving_distances, dtype=float)[nonzero] / great_circle_distances[nonzero]).min())
 
-    def _reconstruct_path(self, prev_legs: dict[ChargeStation, Leg], end: ChargeStation) -> list[Leg]:
-        """Returns a list of legs leading from the start charge station in prev_edges to end."""
-        if end not in prev_legs:
-            return []
-        else:
-            return self._reconstruct_path(prev_legs, prev_legs[end].get_other_endpoint(end)) + [prev_legs[end]]
+
+def _driving_distances_from(graph: _CompactGraph, source: int) -> list[float]:
+    """
+    Returns the driving distance in meters of the shortest path from the charge station with index source
+    to every charge station in graph (using Dijkstra's algorithm), or infinity where no path exists.
+    """
+    offsets, neighbours, driving_distances = graph.offsets, graph.neighbours, graph.driving_distances
+
+    distances = [math.inf] * len(graph.stations)
+    distances[source] = 0
+    fringe = [(0, source)]
+
+    while fringe:
+        curr_distance, curr = heapq.heappop(fringe)
+
+        if curr_distance > distances[curr]:
+            continue  # stale entry
+
+        for k in range(offsets[curr], offsets[curr + 1]):
+            neighbour = neighbours[k]
+            temp_distance = curr_distance + driving_distances[k]
+
+            if temp_distance < distances[neighbour]:
+                distances[neighbour] = temp_distance
+                heapq.heappush(fringe, (temp_distance, neighbour))
+
+    return distances
+
+
+def _landmark_lower_bounds(landmark_distances: np.ndarray, target: int) -> np.ndarray:
+    """
+    Returns a lower bound on the driving distance from each charge station to the charge station with index
+    target, given the driving distances from a set of landmarks to each charge station.
+
+    Bounds involving a charge station a landmark cannot reach are replaced with 0, which is always a lower bound.
+    """
+    with np.errstate(invalid='ignore'):
+        differences = np.abs(landmark_distances - landmark_distances[:, target, np.newaxis])
+
+    differences[~np.isfinite(differences)] = 0
+    return differences.max(axis=0)
 
 
 class PathNotNeeded(Exception):
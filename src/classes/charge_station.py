@@ -2,18 +2,20 @@
 Defines the ChargeStation class.
 """
 import datetime
-from dataclasses import dataclass
+import math
+from dataclasses import dataclass, field, fields
 from typing import Optional
 
 
-@dataclass(eq=False)
+@dataclass(eq=False, frozen=True, slots=True)
 class ChargeStation:
     """
     A dataclass representing a charger station.
 
     This dataclasses objects are used as vertices in the ChargeNetwork class.
 
-    This dataclass is immutable and falls back to id based hashing and equality checking (due to the eq=False argument).
+    This dataclass is immutable (due to the frozen=True argument) and falls back to id based hashing
+    and equality checking (due to the eq=False argument).
 
     Instance Attributes:
         - name: station name
@@ -23,6 +25,10 @@ class ChargeStation:
         - lat: the station's latitude
         - lng: the station's longitude
         - open_date: the station's open date
+        - coord: the latitude, longitude pair of this charge station (derived from lat and lng)
+        - lat_rad: the station's latitude in radians (derived from lat)
+        - lng_rad: the station's longitude in radians (derived from lng)
+        - cos_lat: the cosine of the station's latitude (derived from lat)
     """
     name: Optional[str]
     address: Optional[str]
@@ -31,16 +37,26 @@ class ChargeStation:
     lat: float
     lng: float
     open_date: Optional[datetime.date]
+    coord: tuple[float, float] = field(init=False, repr=False)
+    lat_rad: float = field(init=False, repr=False)
+    lng_rad: float = field(init=False, repr=False)
+    cos_lat: float = field(init=False, repr=False)
 
-    @property
-    def coord(self) -> tuple[float, float]:
-        """Returns the latitude, longitude pair of this charge station."""
-        return self.lat, self.lng
+    def __post_init__(self) -> None:
+        """
+        Precomputes the values used when calculating great circle distances to this charge station.
+
+        Uses object.__setattr__ since this dataclass is frozen.
+        """
+        object.__setattr__(self, 'coord', (self.lat, self.lng))
+        object.__setattr__(self, 'lat_rad', math.radians(self.lat))
+        object.__setattr__(self, 'lng_rad', math.radians(self.lng))
+        object.__setattr__(self, 'cos_lat', math.cos(self.lat_rad))
 
     @property
     def formatted_dict(self) -> dict[str, str]:
-        """Returns a version of vars(self) with content formatted for user display."""
-        result = vars(self).copy()
+        """Returns a dict of the initialized attributes of self with content formatted for user display."""
+        result = {f.name: getattr(self, f.name) for f in fields(self) if f.init}
 
         if result['open_date'] is not None:
             result['open_date'] = f"{result['open_date']:%B %d %Y}".replace(' 0', ' ')
@@ -15,14 +15,22 @@ class Leg:
     A leg is said to be equal to another if its endpoints are equal.
 
     Instance Attributes:
-        - endpoints: start and end charge stations of this edge (immutable)
+        - endpoints: the two charge stations of this edge ordered by id (immutable)
         - driving_distance: road distance between endpoints in meters
         - driving_time: time spent driving between endpoints in seconds
 
     Representation Invariants:
         - len(self.endpoints) == 2
+        - id(self.endpoints[0]) <= id(self.endpoints[1])
     """
-    _endpoints: set[ChargeStation]
+    # Private Instance Attributes:
+    #   - _cs1: the endpoint with the lower id
+    #   - _cs2: the endpoint with the higher id
+    #   - _hash: the hash of the endpoints, computed once since they never change
+    __slots__ = ('_cs1', '_cs2', '_hash', 'driving_distance', 'driving_time')
+    _cs1: ChargeStation
+    _cs2: ChargeStation
+    _hash: int
     driving_distance: Optional[int]
     driving_time: Optional[int]
 
@@ -32,18 +40,22 @@ class Leg:
                  driving_distance: int = None,
                  driving_time: int = None) -> None:
         """Initializes the object."""
-        self._endpoints = {cs1, cs2}
+        if id(cs1) <= id(cs2):
+            self._cs1, self._cs2 = cs1, cs2
+        else:
+            self._cs1, self._cs2 = cs2, cs1
+        self._hash = hash((self._cs1, self._cs2))
         self.driving_distance = driving_distance
         self.driving_time = driving_time
 
     @property
-    def endpoints(self) -> set[ChargeStation]:
+    def endpoints(self) -> tuple[ChargeStation, ChargeStation]:
         """A getter for self.endpoints."""
-        return self._endpoints
+        return self._cs1, self._cs2
 
     def get_other_endpoint(self, cs: ChargeStation) -> ChargeStation:
         """Returns the endpoint that isn't the input charge station."""
-        return (self._endpoints - {cs}).pop()
+        return self._cs1 if cs is self._cs2 else self._cs2
 
     def __eq__(self, other: Self) -> bool:
         """
@@ -51,14 +63,13 @@ class Leg:
 
         Used in ChargeNetwork.get_possible_edges
         """
-        return self.endpoints == other.endpoints
+        return self._cs1 is other._cs1 and self._cs2 is other._cs2
 
     def __hash__(self) -> int:
         """
         Return the hash value.
 
         Allows Leg objects to be stored in sets.
+        Since endpoints are ordered by id, this agrees with __eq__ regardless of the order they were given in.
         """
-        coords = [cs.coord for cs in self.endpoints]
-        coords.sort()
-        return hash((self.__class__, coords[0], coords[1]))
+        return self._hash
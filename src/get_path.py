@@ -8,7 +8,11 @@ import googlemaps
 
 from classes.charge_network import ChargeNetwork
 from simulate_path import get_path_info, simulate_path_charging, prepare_json_summary
-from utils import calcs, visuals
+from utils import visuals
+
+# the networks loaded by handle_get_path_request, keyed by filepath,
+# along with the modification time of the file when each was loaded
+_loaded_networks: dict[str, tuple[float, ChargeNetwork]] = {}
 
 
 def generic_charge_curve(charge: float):
@@ -26,7 +30,8 @@ def generic_charge_curve(charge: float):
     h = 55352.6
     i = -71588.6
     j = 33607.2
-    return f * x ** 1 + g * x ** 2 + h * x ** 3 + i * x ** 4 + j * x ** 5
+    # f * x + g * x^2 + h * x^3 + i * x^4 + j * x^5 in Horner form, which needs no powers
+    return ((((j * x + i) * x + h) * x + g) * x + f) * x
 
 
 def handle_get_path_request(input_filepath: str,
@@ -61,11 +66,10 @@ def handle_get_path_request(input_filepath: str,
         'start_battery': start_battery
     }
 
-    net = ChargeNetwork.from_json(input_filepath)  # todo cache net ???
+    net = _get_network(input_filepath)
 
-    all_charge_stations = list(net.charge_stations())
-    cs1 = min(all_charge_stations, key=lambda c: calcs.great_circle_distance(coord1, c.coord))
-    cs2 = min(all_charge_stations, key=lambda c: calcs.great_circle_distance(coord2, c.coord))
+    cs1 = net.get_closest_charge_station(coord1)
+    cs2 = net.get_closest_charge_station(coord2)
 
     path = net.get_shortest_path(cs1, cs2, min_leg_length, (max_battery - min_battery) * ev_range)
     # could raise PathNotFound or PathNotNeeded
@@ -78,6 +82,27 @@ def handle_get_path_request(input_filepath: str,
     return json_dict
 
 
+def _get_network(filepath: str) -> ChargeNetwork:
+    """
+    Returns the network in the JSON file at filepath, only loading it if it has not been loaded before
+    or the file has changed since.
+
+    Landmarks are precomputed when the network is loaded, since the network is then reused
+    for every path request.
+
+    Preconditions:
+        - filepath leads to a JSON file exported from a previous ChargeNetwork object
+    """
+    modified_time = os.path.getmtime(filepath)
+
+    if filepath not in _loaded_networks or _loaded_networks[filepath][0] != modified_time:
+        net = ChargeNetwork.from_json(filepath)
+        net.precompute_landmarks()
+        _loaded_networks[filepath] = (modified_time, net)
+
+    return _loaded_networks[filepath][1]
+
+
 if __name__ == '__main__':
     # visualize network
     network = ChargeNetwork.from_json('created_network/network.json')
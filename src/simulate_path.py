@@ -46,7 +46,7 @@ def get_path_info(path: list[Leg],
     """
     charge_stations = [start]
     for leg in path:
-        charge_stations.append(leg.endpoints.difference({charge_stations[-1]}).pop())  # find the next endpoint
+        charge_stations.append(leg.get_other_endpoint(charge_stations[-1]))  # find the next endpoint
 
     response = gmaps.directions(charge_stations[0].coord,
                                 charge_stations[-1].coord,
@@ -109,7 +109,7 @@ def prepare_json_summary(path: list[Leg],
     """Returns a JSON compatible dict containing a detailed summary of the path."""
     charge_stations = [start]
     for leg in path:
-        charge_stations.append(leg.endpoints.difference({charge_stations[-1]}).pop())  # find the next endpoint
+        charge_stations.append(leg.get_other_endpoint(charge_stations[-1]))  # find the next endpoint
 
     assert len(info) == len(charge_stations) - 1
 
@@ -2,102 +2,257 @@
 Define generalized calculation functions.
 """
 import math
-from typing import Callable, Any
 
+import numpy as np
 
-def lowest_average_distance(points: set[Any],
-                            distance_func: Callable = math.dist,
-                            coords_key: Callable = lambda x: (x[0], x[1])) -> Any:
+
+def medoid_and_furthest(distance_matrix: np.ndarray) -> tuple[int, int, int]:
     """
-    Returns a point such that the average distance between it and every other point is minimised.
+    Returns the index of the medoid, which is a point such that the average distance between it and every other
+    point is minimised, followed by the indices of two points such that the distance between them is maximised.
+
+    Takes a matrix where the entry at [i, j] is the distance between the points with index i and index j,
+    such as one returned by great_circle_distance_matrix.
+
+    Preconditions:
+        - len(distance_matrix.shape) == 2
+        - distance_matrix.shape[0] == distance_matrix.shape[1] >= 1
 
-    Takes an optional distance parameter that calculates the distance between two coordinates,
-    which defaults to calculating euclidean distances.
+    >>> medoid_and_furthest(np.array([[0, 1, 3], [1, 0, 2], [3, 2, 0]]))
+    (1, 0, 2)
+    """
+    medoid = int(distance_matrix.sum(axis=1).argmin())
+    i, j = divmod(int(distance_matrix.argmax()), distance_matrix.shape[1])
+    return medoid, i, j
 
-    Takes an optional key parameter which must return an indexable coordinate
-    containing a latitude, longitude pair. Otherwise, if the points being passed are already
-    in that form (ex. tuple), key can be ignored.
+
+def great_circle_distance(p1: tuple[float, float], p2: tuple[float, float]) -> float:
+    """
+    Returns the great circle distance in kilometers between the two given points using the equation below.
+
+    https://en.wikipedia.org/wiki/Great-circle_distance
 
     Preconditions:
-        - len(points) >= 1
+    - -90 <= p1[0] <= 90
+    - -180 <= p1[1] <= 180
+    - -90 <= p2[0] <= 90
+    - -180 <= p2[1] <= 180
+
+    >>> round(great_circle_distance((52.133174, -106.630807), (50.401793, 30.449782)))
+    7920
     """
-    min_average_distance_so_far, point_so_far = float('inf'), None
+    lat1 = math.radians(p1[0])
+    lng1 = math.radians(p1[1])
+    lat2 = math.radians(p2[0])
+    lng2 = math.radians(p2[1])
+
+    sin_half_lat_diff = math.sin((lat1 - lat2) * 0.5)
+    sin_half_lng_diff = math.sin((lng1 - lng2) * 0.5)
 
-    for i in points:
-        i_coord = coords_key(i)
-        sum_so_far = 0
-        for j in points:
-            j_coord = coords_key(j)
-            sum_so_far += distance_func(i_coord, j_coord)
+    hav_central_angle = (sin_half_lat_diff * sin_half_lat_diff
+                         + math.cos(lat1) * math.cos(lat2) * sin_half_lng_diff * sin_half_lng_diff)
+    return 6371 * 2 * math.asin(math.sqrt(min(hav_central_angle, 1)))
 
-        average = sum_so_far / len(points)
-        if average < min_average_distance_so_far:
-            min_average_distance_so_far, point_so_far = average, i
 
-    return point_so_far
+def great_circle_distances_to_point(lat_rads: np.ndarray,
+                                    lng_rads: np.ndarray,
+                                    cos_lats: np.ndarray,
+                                    lat_rad: float | np.ndarray,
+                                    lng_rad: float | np.ndarray,
+                                    cos_lat: float | np.ndarray) -> np.ndarray:
+    """
+    Returns an array where the entry at i is the great circle distance in kilometers
+    between (lat_rads[i], lng_rads[i]) and (lat_rad, lng_rad), all given in radians
+    along with the precomputed cosine of each latitude.
+
+    This is a vectorized version of great_circle_distance which skips converting to radians
+    and computes the distance from every point to the same point at once. If lat_rad, lng_rad, and cos_lat
+    are instead arrays of the same shape as lat_rads, the distance is computed between the points at each index.
 
+    Preconditions:
+        - lat_rads.shape == lng_rads.shape == cos_lats.shape
+        - len(lat_rads.shape) == 1
+        - lat_rad, lng_rad, and cos_lat are all floats or all arrays of shape lat_rads.shape
 
-def furthest_apart(points: set[Any],
-                   distance_func: Callable = math.dist,
-                   coords_key: Callable = lambda x: (x[0], x[1])) -> tuple:
+    >>> lat1, lng1, lat2, lng2 = map(math.radians, (52.133174, -106.630807, 50.401793, 30.449782))
+    >>> distances = great_circle_distances_to_point(np.array([lat1, lat2]), np.array([lng1, lng2]),
+    ...                                             np.cos([lat1, lat2]), lat2, lng2, math.cos(lat2))
+    >>> [round(distance) for distance in distances]
+    [7920, 0]
     """
-    Returns two points such that the distance between them is maximised.
+    sin_half_lat_diffs = np.sin((lat_rads - lat_rad) * 0.5)
+    sin_half_lng_diffs = np.sin((lng_rads - lng_rad) * 0.5)
+
+    hav_central_angles = sin_half_lat_diffs * sin_half_lat_diffs
+    hav_central_angles += cos_lats * cos_lat * sin_half_lng_diffs * sin_half_lng_diffs
+    np.clip(hav_central_angles, 0, 1, out=hav_central_angles)
 
-    Takes an optional distance parameter that calculates the distance between two coordinates.
-    If no such parameter is provided, euclidean distances are used.
+    return 6371 * 2 * np.arcsin(np.sqrt(hav_central_angles))
 
-    Takes an optional key parameter which must return an indexable coordinate
-    containing a latitude, longitude pair. Otherwise, if the points being passed are already
-    in that form (ex. tuple), key can be ignored.
+
+def great_circle_distance_matrix(lats: np.ndarray, lngs: np.ndarray, block_size: int = 128) -> np.ndarray:
+    """
+    Returns a matrix where the entry at [i, j] is the great circle distance in kilometers
+    between (lats[i], lngs[i]) and (lats[j], lngs[j]).
+
+    This is a vectorized version of great_circle_distance which computes every pair at once.
+
+    The matrix is calculated and returned in float32, which halves its memory use and is accurate to within
+    a few meters, far below the precision of any distance threshold it is compared against.
+
+    The matrix is filled block_size rows at a time, and every step of the calculation writes into either
+    the result or one of two reusable scratch buffers, so no temporary matrices are allocated and each
+    block stays in cache between steps.
 
     Preconditions:
-        - len(points) >= 1
+        - lats.shape == lngs.shape
+        - len(lats.shape) == 1
+        - all(-90 <= lat <= 90 for lat in lats)
+        - all(-180 <= lng <= 180 for lng in lngs)
+        - block_size >= 1
+
+    >>> matrix = great_circle_distance_matrix(np.array([52.133174, 50.401793]), np.array([-106.630807, 30.449782]))
+    >>> [[round(distance) for distance in row] for row in matrix]
+    [[0, 7920], [7920, 0]]
     """
-    max_distance_so_far, points_so_far = 0, None
+    lats = np.radians(lats, dtype=np.float32)
+    lngs = np.radians(lngs, dtype=np.float32)
+    cos_lats = np.cos(lats)
 
-    for i in points:
-        i_coord = coords_key(i)
-        for j in points:
-            j_coord = coords_key(j)
-            distance = distance_func(i_coord, j_coord)
+    n = len(lats)
+    result = np.empty((n, n), dtype=np.float32)
+    lng_term_buffer = np.empty(min(block_size, n) * n, dtype=np.float32)
+    cos_term_buffer = np.empty(min(block_size, n) * n, dtype=np.float32)
 
-            if distance >= max_distance_so_far:
-                max_distance_so_far, points_so_far = distance, (i, j)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
 
-    return points_so_far
+        # the matrix is symmetric, so each block only computes the columns from its first row onwards
+        # (the upper triangle and the block on the diagonal) and the rest is mirrored from earlier blocks
+        hav_central_angle = result[start:stop, start:]
+        block_shape = hav_central_angle.shape
+        lng_term = lng_term_buffer[:hav_central_angle.size].reshape(block_shape)
+        cos_term = cos_term_buffer[:hav_central_angle.size].reshape(block_shape)
 
+        np.subtract.outer(lats[start:stop], lats[start:], out=hav_central_angle)
+        hav_central_angle /= 2
+        np.sin(hav_central_angle, out=hav_central_angle)
+        np.square(hav_central_angle, out=hav_central_angle)
 
-def great_circle_distance(p1: tuple[float, float], p2: tuple[float, float]) -> float:
+        np.subtract.outer(lngs[start:stop], lngs[start:], out=lng_term)
+        lng_term /= 2
+        np.sin(lng_term, out=lng_term)
+        np.square(lng_term, out=lng_term)
+
+        np.multiply.outer(cos_lats[start:stop], cos_lats[start:], out=cos_term)
+        cos_term *= lng_term
+        hav_central_angle += cos_term
+
+        # clip to guard against floating point error pushing the value slightly outside the domain of arcsin
+        np.clip(hav_central_angle, 0, 1, out=hav_central_angle)
+        np.sqrt(hav_central_angle, out=hav_central_angle)
+        np.arcsin(hav_central_angle, out=hav_central_angle)
+        hav_central_angle *= 6371 * 2
+
+        result[start:, start:stop] = hav_central_angle.T
+
+    return result
+
+
+def pairs_within_distance(lats: np.ndarray,
+                          lngs: np.ndarray,
+                          max_distance: float,
+                          block_size: int = 256) -> tuple[np.ndarray, np.ndarray]:
     """
-    Returns the great circle distance in kilometers between the two given points using the equation below.
+    Returns two index arrays i_indices and j_indices such that (i_indices[k], j_indices[k]) are exactly the
+    unordered pairs of distinct points with a great circle distance less than max_distance kilometers.
 
-    https://en.wikipedia.org/wiki/Great-circle_distance
+    Rather than computing every pairwise distance, the points are sorted by latitude and each point is only
+    compared to the points after it within a latitude band of max_distance. This is valid since the great
+    circle distance between two points is at least the distance spanned by their difference in latitude.
+
+    The sorted points are processed in blocks of block_size rows, which bounds the memory used at once.
 
     Preconditions:
-    - -90 <= p1[0] <= 90
-    - -180 <= p1[1] <= 180
-    - -90 <= p2[0] <= 90
-    - -180 <= p2[1] <= 180
+        - lats.shape == lngs.shape
+        - len(lats.shape) == 1
+        - all(-90 <= lat <= 90 for lat in lats)
+        - all(-180 <= lng <= 180 for lng in lngs)
+        - max_distance >= 0
+        - block_size >= 1
 
-    >>> round(great_circle_distance((52.133174, -106.630807), (50.401793, 30.449782)))
-    7920
+    >>> i_indices, j_indices = pairs_within_distance(np.array([0, 50, 0.5]), np.array([0, 0, 0.5]), 100)
+    >>> i_indices.tolist(), j_indices.tolist()
+    ([0], [2])
     """
-    lat1 = (math.pi / 180) * p1[0]
-    lon1 = (math.pi / 180) * p1[1]
-    lat2 = (math.pi / 180) * p2[0]
-    lon2 = (math.pi / 180) * p2[1]
+    order = np.argsort(lats, kind='stable')
+    sorted_lats = np.radians(lats[order])
+    sorted_lngs = np.radians(lngs[order])
+    sorted_cos_lats = np.cos(sorted_lats)
 
-    lat_diff = abs(lat1 - lat2)
-    lon_diff = abs(lon1 - lon2)
+    band_ends = np.searchsorted(sorted_lats, sorted_lats + max_distance / 6371, side='right')
+    max_lng_diffs = _max_lng_diffs(sorted_cos_lats, max_distance)
 
-    central_angle = 2 * math.asin(
-        math.sqrt(
-            _hav(lat_diff) + (1 - _hav(lat_diff) - _hav(lat1 + lat2)) * _hav(lon_diff)
-        )
-    )
-    return 6371 * central_angle
+    blocks = [
+        _pairs_within_distance_block(sorted_lats, sorted_lngs, sorted_cos_lats, band_ends, max_lng_diffs,
+                                     max_distance, start, start + block_size)
+        for start in range(0, len(order), block_size)
+    ]
 
+    if not blocks:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+
+    i_sorted = np.concatenate([block[0] for block in blocks])
+    j_sorted = np.concatenate([block[1] for block in blocks])
+    return order[i_sorted], order[j_sorted]
+
+
+def _pairs_within_distance_block(sorted_lats: np.ndarray,
+                                 sorted_lngs: np.ndarray,
+                                 sorted_cos_lats: np.ndarray,
+                                 band_ends: np.ndarray,
+                                 max_lng_diffs: np.ndarray,
+                                 max_distance: float,
+                                 start: int,
+                                 stop: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the pairs found by pairs_within_distance whose first index is in range(start, stop),
+    using indices into the latitude sorted arrays.
+    """
+    rows = np.arange(start, min(stop, len(sorted_lats)))
+    cols = np.arange(start + 1, band_ends[rows[-1]])
+
+    # wrap longitude differences into [0, pi] so the bounding box check also holds across the antimeridian
+    lng_diff = np.abs(sorted_lngs[cols][None, :] - sorted_lngs[rows][:, None])
+    lng_diff = np.minimum(lng_diff, 2 * math.pi - lng_diff)
+
+    # each pair is only kept once, from the row of the point that comes first in sorted order,
+    # and the full distance is only computed for pairs inside the bounding box of the row's point
+    i_block, j_block = np.nonzero((cols[None, :] > rows[:, None]) & (lng_diff <= max_lng_diffs[rows][:, None]))
+    i_candidates, j_candidates = rows[i_block], cols[j_block]
+
+    hav_central_angle = np.sin((sorted_lats[j_candidates] - sorted_lats[i_candidates]) / 2) ** 2 + \
+        sorted_cos_lats[i_candidates] * sorted_cos_lats[j_candidates] * \
+        np.sin((sorted_lngs[j_candidates] - sorted_lngs[i_candidates]) / 2) ** 2
+    distances = 6371 * 2 * np.arcsin(np.sqrt(np.clip(hav_central_angle, 0, 1)))
+
+    is_within = distances < max_distance
+    return i_candidates[is_within], j_candidates[is_within]
+
+
+def _max_lng_diffs(cos_lats: np.ndarray, max_distance: float) -> np.ndarray:
+    """
+    Returns the largest difference in longitude in radians that a point within max_distance kilometers
+    of each given point can have, where cos_lats are the cosines of the given points' latitudes.
+
+    This is the longitude extent of a circle of radius max_distance on the sphere, as referenced below.
+    If the circle contains a pole, any longitude is possible and the bound is pi.
+
+    http://janmatuschek.de/LatitudeLongitudeBoundingCoordinates
+    """
+    sin_angle = math.sin(min(max_distance / 6371, math.pi / 2))
 
-def _hav(num: float) -> float:
-    """Returns the haversine of the number."""
-    return math.sin(num / 2) ** 2
+    result = np.full(len(cos_lats), math.pi)
+    bounded = sin_angle < cos_lats
+    result[bounded] = np.arcsin(sin_angle / cos_lats[bounded])
+    return result
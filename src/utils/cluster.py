@@ -1,9 +1,11 @@
 """
 Create a divisive hierarchical clustering tree containing charge stations.
 """
-from typing import Self
+from typing import Collection, Optional, Self
 
-from calcs import lowest_average_distance, furthest_apart, great_circle_distance
+import numpy as np
+
+from calcs import medoid_and_furthest, great_circle_distance_matrix
 from classes.charge_station import ChargeStation
 
 
@@ -19,6 +21,7 @@ class ClusterTree:
         - every direct parent of a leaf is the centroid of a cluster of charge points
           which are its children (including itself)
         - given any node, a child is a leaf if and only if all children are leafs
+          (which is recorded in _is_leaf_parent when the node is built)
 
     Instance Attributes:
         - max_cluster_diameter: the diameter in kilometers of a circle such that clusters which fit
@@ -28,12 +31,16 @@ class ClusterTree:
         - _max_cluster_diameter >= 0
     """
     _centroid: ChargeStation
-    _subclusters: set[Self | ChargeStation]
+    _subclusters: list[Self | ChargeStation]
+    _is_leaf_parent: bool
     _max_cluster_diameter: float
 
-    def __init__(self, charge_stations: set[ChargeStation], max_cluster_diameter: float) -> None:
+    def __init__(self,
+                 charge_stations: Collection[ChargeStation],
+                 max_cluster_diameter: float,
+                 coords: Optional[np.ndarray] = None) -> None:
         """
-        Recursively initialize the tree using Divisive Hierarchical Clustering as referenced below.
+        Initialize the tree using Divisive Hierarchical Clustering as referenced below.
 
         https://en.wikipedia.org/wiki/Hierarchical_clustering
 
@@ -49,51 +56,87 @@ class ClusterTree:
         station can be added as a child of root, and the root represents the cluster.
         Note that this implicitly covers len(charge_stations) == 1 since the distance would then be 0.
 
-        Otherwise, the charge stations are then split into two groups and recursed on (meaning
-        that this tree will be binary if we ignore leafs). This is done by picking the charge
-        stations that are the furthest apart, and then dividing the charge stations into two groups
-        depending based on the distance of each charge station to two chosen charge stations.
+        Otherwise, the charge stations are then split into two groups and each group becomes a subtree
+        built the same way (meaning that this tree will be binary if we ignore leafs). This is done by
+        picking the charge stations that are the furthest apart, and then dividing the charge stations
+        into two groups depending based on the distance of each charge station to two chosen charge stations.
+
+        Subtrees are built from an explicit stack rather than by recursion, so deep trees do not hit
+        the recursion limit. The great circle distance matrix of the charge stations is only computed
+        once at the root, and each subtree is given the rows and columns of its charge stations.
+        Subtrees refer to their charge stations by index into the given charge stations, so lists of
+        charge stations are only built for the leafs. If coords is given, it is used as the (lat, lng) of
+        each charge station instead of reading them from the charge stations one at a time.
 
         Preconditions:
             - len(charge_stations) >= 1
+            - coords is None or coords.shape == (len(charge_stations), 2)
+            - coords is None or coords[i] is the coord of the charge station at position i of charge_stations
+        """
+        charge_stations_list = list(charge_stations)
+        if coords is None:
+            coords = np.fromiter((coord for cs in charge_stations_list for coord in cs.coord),
+                                 dtype=float, count=2 * len(charge_stations_list)).reshape(-1, 2)
+
+        # the root distance matrix is only referenced from the stack, so it is freed once the root is built
+        stack = [(self, np.arange(len(charge_stations_list)), great_circle_distance_matrix(coords[:, 0], coords[:, 1]))]
+        while stack:
+            node, indices, node_distances = stack.pop()
+            stack.extend(node._build(charge_stations_list, indices, node_distances, max_cluster_diameter))
+
+    def _build(self,
+               all_charge_stations: list[ChargeStation],
+               indices: np.ndarray,
+               distances: np.ndarray,
+               max_cluster_diameter: float) -> list[tuple[Self, np.ndarray, np.ndarray]]:
+        """
+        Initializes this node following STEP 1 and STEP 2 of __init__, without building its subtrees,
+        where the charge stations of this node are all_charge_stations[k] for each k in indices.
+
+        Returns a (subtree, indices, distances) tuple for each subtree that still needs to be built,
+        which is empty if the children of this node are leafs.
+
+        This is a mutating method.
+
+        Preconditions:
+            - len(indices) >= 1
+            - distances[i, j] is the great circle distance between all_charge_stations[indices[i]]
+              and all_charge_stations[indices[j]]
         """
         self._max_cluster_diameter = max_cluster_diameter
 
+        # the centroid and the two furthest apart charge stations are found together
+        # from the same distance matrix
+        centroid, i, j = medoid_and_furthest(distances)
+
         # STEP 1. assign _centroid to be the charge station with the lowest average distance
         #         to all charge stations it represents
 
-        self._centroid = lowest_average_distance(
-            points=charge_stations,
-            distance_func=great_circle_distance,
-            coords_key=lambda cs: cs.coord
-        )
+        self._centroid = all_charge_stations[indices[centroid]]
 
         # STEP 2. see if the charge stations need to be further clustered
 
-        charge_station1, charge_station2 = furthest_apart(
-            points=charge_stations,
-            distance_func=great_circle_distance,
-            coords_key=lambda cs: cs.coord
-        )
-
-        distance_furthest_apart = great_circle_distance(charge_station1.coord, charge_station2.coord)
-
-        if distance_furthest_apart <= self.max_cluster_diameter:
-            self._subclusters = charge_stations
-        else:
-            new_cluster1 = set()
-            new_cluster2 = set()
-            for charge_station in charge_stations:
-                if great_circle_distance(charge_station.coord, charge_station1.coord) < \
-                        great_circle_distance(charge_station.coord, charge_station2.coord):
-                    new_cluster1.add(charge_station)
-                else:
-                    new_cluster2.add(charge_station)
-
-            self._subclusters = {
-                ClusterTree(new_cluster1, max_cluster_diameter),
-                ClusterTree(new_cluster2, max_cluster_diameter)
-            }
+        distance_furthest_apart = distances[i, j]
+
+        self._is_leaf_parent = bool(distance_furthest_apart <= self.max_cluster_diameter)
+
+        if self._is_leaf_parent:
+            self._subclusters = [all_charge_stations[k] for k in indices.tolist()]
+            return []
+
+        # the distances to the two furthest apart charge stations are read from the matrix
+        # so the split uses the same distances as the diameter check above
+        closer_to_i = distances[:, i] < distances[:, j]
+        new_cluster1 = np.flatnonzero(closer_to_i)
+        new_cluster2 = np.flatnonzero(~closer_to_i)
+
+        # subtrees are created empty and initialized later by __init__
+        self._subclusters = [ClusterTree.__new__(ClusterTree), ClusterTree.__new__(ClusterTree)]
+
+        return [
+            (subtree, indices[new_cluster], distances[np.ix_(new_cluster, new_cluster)])
+            for subtree, new_cluster in zip(self._subclusters, (new_cluster1, new_cluster2))
+        ]
 
     @property
     def max_cluster_diameter(self) -> float:
@@ -104,36 +147,34 @@ class ClusterTree:
         """
         Returns a list of clusters of charge stations by traversing the
         tree in order to accumulate all groups of leafs.
-        """
 
-        assert self._subclusters  # we should not have recursed into leafs
-
-        random_child = next(iter(self._subclusters))
-
-        if isinstance(random_child, ChargeStation):  # the child is a leaf, so in this tree, all children are leafs
-            return [list(self._subclusters)]
+        The tree is traversed with an explicit stack rather than by recursion.
+        """
+        result = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node._is_leaf_parent:  # all children are leafs
+                result.append(list(node._subclusters))
+            else:  # all children are not leafs, and are pushed in reverse to be visited in order
+                stack.extend(reversed(node._subclusters))
 
-        else:  # the child is not a leaf, so in this tree, all children are not leafs
-            result = []
-            for child in self._subclusters:
-                result.extend(child.get_list_of_clusters())
-            return result
+        return result
 
     def get_list_of_final_centroids(self) -> list[ChargeStation]:
         """
         Returns a list of charge stations which are the centroids representing the clusters
         of charge stations by traversing the tree in order to accumulate all parents of groups of leafs.
-        """
-
-        assert self._subclusters  # we should not have recursed into leafs
-
-        random_child = next(iter(self._subclusters))
 
-        if isinstance(random_child, ChargeStation):  # the child is a leaf, so in this tree, all children are leafs
-            return [self._centroid]
-
-        else:  # the child is not a leaf, so in this tree, all children are not leafs
-            result = []
-            for child in self._subclusters:
-                result.extend(child.get_list_of_final_centroids())
-            return result
+        The tree is traversed with an explicit stack rather than by recursion.
+        """
+        result = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node._is_leaf_parent:  # all children are leafs
+                result.append(node._centroid)
+            else:  # all children are not leafs, and are pushed in reverse to be visited in order
+                stack.extend(reversed(node._subclusters))
+
+        return result
@@ -6,9 +6,13 @@ https://afdc.energy.gov/fuels/electricity_locations.html#/analyze?fuel=ELEC
 """
 import csv
 import datetime
+import os
+from typing import Optional
 
 import googlemaps
-from shapely.geometry import Point
+import numpy as np
+import orjson
+import shapely
 from shapely.geometry.polygon import Polygon
 
 from classes.charge_network import ChargeNetwork
@@ -17,12 +21,20 @@ from classes.leg import Leg
 from cluster import ClusterTree
 from visuals import graph_network, graph_clusters
 
+# the googlemaps distance matrix api allows at most 25 destinations per call
+MAX_DESTINATIONS_PER_CALL = 25
+
+# mainland north america in (lat, lng) coordinates, prepared once so every containment check reuses its index
+_NORTH_AMERICA_POLYGON = Polygon([(52, -170), (71, -166), (46, -48), (24, -80), (24, -120)])
+shapely.prepare(_NORTH_AMERICA_POLYGON)
+
 
 def make_network(input_filepath: str,
                  min_chargers: int,
                  ev_range: int,
                  cluster_diameter: int,
-                 output_filepath: str) -> None:
+                 output_filepath: str,
+                 leg_cache_filepath: Optional[str] = None) -> None:
     """
     Creates a complete network from a data file of charge stations
     and visualizes the progress intermittently as outlined below.
@@ -41,6 +53,8 @@ def make_network(input_filepath: str,
         - ev_range: the max road distance in kilometers of each leg when creating this network
         - cluster_diameter: the max diameter in kilometers of cluster created when clustering this network
         - output_filepath: the file path the JSON file will be saved as (ending in .json)
+        - leg_cache_filepath: the file path of a JSON file of previous googlemaps results to reuse and add to
+          (ending in .json), or None to always call the googlemaps api
 
     Preconditions:
         - input_filepath leads to a csv in the default format downloaded from
@@ -56,7 +70,7 @@ def make_network(input_filepath: str,
 
     # STEP 2. MAKE A CLUSTER TREE BASED OF THE FIRST GRAPH
 
-    cluster_tree = ClusterTree(full_network.charge_stations(), cluster_diameter)
+    cluster_tree = ClusterTree(list(full_network.charge_stations()), cluster_diameter, full_network.coords_array())
 
     cluster_list = cluster_tree.get_list_of_clusters()
     graph_clusters(cluster_list, display_result=True)
@@ -66,16 +80,18 @@ def make_network(input_filepath: str,
 
     centroids = cluster_tree.get_list_of_final_centroids()
     simplified_network = ChargeNetwork(min_chargers, ev_range)
-    for cs in centroids:
-        simplified_network.add_charge_station(cs)
+    simplified_network.add_charge_stations(centroids)
 
     graph_network(simplified_network, display_result=True)
 
     # STEP 4. ADD LEGS TO THE NEW GRAPH USING GOOGLEMAPS API
 
     legs = simplified_network.get_possible_legs()
+    leg_cache = load_leg_cache(leg_cache_filepath) if leg_cache_filepath is not None else None
     gmaps = googlemaps.Client(key=input('what is your google maps api key: '))
-    mutate_legs(legs, gmaps)
+    mutate_legs(legs, gmaps, leg_cache)
+    if leg_cache_filepath is not None:
+        export_leg_cache(leg_cache, leg_cache_filepath)
     simplified_network.safe_load_legs(legs)
 
     graph_network(simplified_network, display_result=True)
@@ -98,6 +114,7 @@ def load_charge_stations_from_csv(charge_network: ChargeNetwork, filepath: str)
         - filepath leads to a csv in the default format downloaded from the
           energy.gov Alternative Fuels Data Center
     """
+    candidate_rows = []
     with open(filepath) as f:
         reader = csv.reader(f)
         next(reader)  # skip the header
@@ -105,38 +122,81 @@ def load_charge_stations_from_csv(charge_network: ChargeNetwork, filepath: str)
         for row in reader:
             dc_fast_count = int(row[19]) if row[19] else 0
 
-            lat = float(row[24])
-            lng = float(row[25])
-            name = row[1] if row[1] else None
-            addr = row[2] if row[2] else None
-            phone = row[8] if row[8] else None
-            hours = row[12] if row[12] else None
-            date = datetime.datetime.strptime(row[32], '%Y-%m-%d').date() if row[32] else None
-
-            if dc_fast_count >= charge_network.min_chargers_at_station and _in_mainland(lat, lng):
-                new_cs = ChargeStation(name, addr, hours, phone, lat, lng, date)
-                charge_network.add_charge_station(new_cs)
-
-
-def _in_mainland(lat: float, lng: float) -> bool:
-    """Returns if the given coordinate is in mainland North America.
-    >>> _in_mainland(40.7128,-74.0060)  # new york
-    True
-    >>> _in_mainland(49.2827,-123.1207)  # vancouver
-    True
-    >>> _in_mainland(51.5074,-0.1278)  # london
-    False
+            if dc_fast_count >= charge_network.min_chargers_at_station:
+                candidate_rows.append(row)
+
+    lats = [float(row[24]) for row in candidate_rows]
+    lngs = [float(row[25]) for row in candidate_rows]
+
+    # every candidate is checked against the polygon in one vectorized call
+    in_mainland = _in_mainland_batch(np.array(lats, dtype=float), np.array(lngs, dtype=float)).tolist()
+    kept_rows = [(row, lat, lng) for row, lat, lng, keep in zip(candidate_rows, lats, lngs, in_mainland) if keep]
+
+    new_charge_stations = []
+    for row, lat, lng in kept_rows:
+        # open dates are always YYYY-MM-DD, which fromisoformat parses without interpreting a format string
+        date = datetime.date.fromisoformat(row[32]) if row[32] else None
+
+        name = row[1] if row[1] else None
+        addr = row[2] if row[2] else None
+        phone = row[8] if row[8] else None
+        hours = row[12] if row[12] else None
+
+        new_charge_stations.append(ChargeStation(name, addr, hours, phone, lat, lng, date))
+
+    charge_network.add_charge_stations(new_charge_stations)
+
+
+def _in_mainland_batch(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Returns a boolean array where entry i is if (lats[i], lngs[i]) is in mainland North America.
+    >>> _in_mainland_batch(np.array([40.7128, 49.2827, 51.5074]), np.array([-74.0060, -123.1207, -0.1278]))
+    array([ True,  True, False])
+    """
+    return shapely.contains_xy(_NORTH_AMERICA_POLYGON, lats, lngs)
+
+
+def load_leg_cache(filepath: str) -> dict[tuple[tuple[float, float], tuple[float, float]], tuple[int, int]]:
+    """
+    Returns the leg cache stored in the JSON file created by export_leg_cache,
+    or an empty leg cache if there is no file at filepath.
+
+    A leg cache maps the coords of the endpoints of a leg (in the order given by _leg_cache_key)
+    to its (driving_distance, driving_time).
     """
-    point = Point(lat, lng)
-    north_america_polygon = Polygon([(52, -170), (71, -166), (46, -48), (24, -80), (24, -120)])
-    return north_america_polygon.contains(point)
+    if not os.path.exists(filepath):
+        return {}
+
+    with open(filepath, 'rb') as file:
+        data = orjson.loads(file.read())
+
+    return {((lat1, lng1), (lat2, lng2)): (driving_distance, driving_time)
+            for lat1, lng1, lat2, lng2, driving_distance, driving_time in data}
 
 
-def mutate_legs(legs: set[Leg], gmaps: googlemaps.client.Client) -> None:
+def export_leg_cache(leg_cache: dict[tuple[tuple[float, float], tuple[float, float]], tuple[int, int]],
+                     filepath: str) -> None:
+    """Outputs a JSON file representing the given leg cache."""
+    data = [[*coord1, *coord2, driving_distance, driving_time]
+            for (coord1, coord2), (driving_distance, driving_time) in leg_cache.items()]
+
+    with open(filepath, 'wb') as file:
+        file.write(orjson.dumps(data))
+
+
+def mutate_legs(legs: set[Leg],
+                gmaps: googlemaps.client.Client,
+                leg_cache: Optional[dict[tuple[tuple[float, float], tuple[float, float]], tuple[int, int]]] = None
+                ) -> None:
     """
     Takes a set of incomplete legs and mutates their driving_distance and driving_time by making calls
     to the given googlemaps client. Any failed calls will result in the leg being discarded.
 
+    Legs are grouped by their first endpoint so that each distance matrix call completes up to
+    MAX_DESTINATIONS_PER_CALL legs from the same origin.
+
+    If a leg cache is given, legs found in it are completed without a call
+    and the results of successful calls are added to it.
+
     Note that normally, there are no failed calls.
 
     Prints a verbose summary.
@@ -149,10 +209,31 @@ def mutate_legs(legs: set[Leg], gmaps: googlemaps.client.Client) -> None:
     """
     init_leg_count = len(legs)
     failed_legs = set()
-    if input(f'you are about to make {len(legs)} calls to the provided client (Y/N): ') == 'Y':
-        for leg in legs:
-            if not _mutate_leg(leg, gmaps):
-                failed_legs.add(leg)
+
+    uncached_legs = []
+    for leg in legs:
+        if leg_cache is not None and (key := _leg_cache_key(leg)) in leg_cache:
+            leg.driving_distance, leg.driving_time = leg_cache[key]
+        else:
+            uncached_legs.append(leg)
+
+    legs_by_origin = {}
+    for leg in uncached_legs:
+        legs_by_origin.setdefault(leg.endpoints[0], []).append(leg)
+
+    batches = [(origin, origin_legs[start:start + MAX_DESTINATIONS_PER_CALL])
+               for origin, origin_legs in legs_by_origin.items()
+               for start in range(0, len(origin_legs), MAX_DESTINATIONS_PER_CALL)]
+
+    if input(f'you are about to make {len(batches)} calls to the provided client '
+             f'for {len(uncached_legs)} legs (Y/N): ') == 'Y':
+        for origin, batch in batches:
+            elements = _get_distance_matrix_elements(origin, batch, gmaps)
+            for leg, element in zip(batch, elements):
+                if not _mutate_leg(leg, element):
+                    failed_legs.add(leg)
+                elif leg_cache is not None:
+                    leg_cache[_leg_cache_key(leg)] = (leg.driving_distance, leg.driving_time)
 
         for leg in failed_legs:
             legs.remove(leg)
@@ -162,9 +243,35 @@ def mutate_legs(legs: set[Leg], gmaps: googlemaps.client.Client) -> None:
         raise KeyboardInterrupt
 
 
-def _mutate_leg(leg: Leg, gmaps: googlemaps.client.Client) -> bool:
+def _get_distance_matrix_elements(origin: ChargeStation,
+                                  legs: list[Leg],
+                                  gmaps: googlemaps.client.Client) -> list[Optional[dict]]:
+    """
+    Returns the distance matrix element from origin to the other endpoint of each leg in legs
+    by making one call to the given googlemaps client, or None for each leg if the call fails.
+
+    Preconditions:
+        - all(leg.endpoints[0] is origin for leg in legs)
+        - 1 <= len(legs) <= MAX_DESTINATIONS_PER_CALL
+    """
+    destinations = [leg.endpoints[1].coord for leg in legs]
+
+    try:
+        response = gmaps.distance_matrix([origin.coord], destinations, mode='driving')
+        elements = response['rows'][0]['elements']
+
+    except Exception:  # todo implement better error handling
+        return [None] * len(legs)
+
+    if len(elements) != len(legs):
+        return [None] * len(legs)
+
+    return elements
+
+
+def _mutate_leg(leg: Leg, element: Optional[dict]) -> bool:
     """
-    Takes an incomplete leg and completes it by making a call to the given googlemaps client.
+    Takes an incomplete leg and completes it using its distance matrix element from the googlemaps client.
 
     Returns True if successful and mutated, or False if unsuccessful and no mutations made.
 
@@ -174,27 +281,30 @@ def _mutate_leg(leg: Leg, gmaps: googlemaps.client.Client) -> bool:
         - leg.driving_distance is None
         - leg.driving_time is None
     """
-    endpoints_iter = iter(leg.endpoints)
-    cs1 = next(endpoints_iter).coord
-    cs2 = next(endpoints_iter).coord
-
-    try:
-        response = gmaps.directions(cs1, cs2)
-        driving_distance = response[0]['legs'][0]['distance']['value']
-        driving_time = response[0]['legs'][0]['duration']['value']
-
-    except Exception:  # todo implement better error handling
+    if element is None or element.get('status') != 'OK':
         return False
 
-    leg.driving_distance = driving_distance
-    leg.driving_time = driving_time
+    leg.driving_distance = element['distance']['value']
+    leg.driving_time = element['duration']['value']
 
     return True
 
 
+def _leg_cache_key(leg: Leg) -> tuple[tuple[float, float], tuple[float, float]]:
+    """
+    Returns the key of the given leg in a leg cache.
+
+    The endpoints of a leg are ordered by id, which changes between runs,
+    so the key orders the endpoint coords by value instead.
+    """
+    coord1, coord2 = (cs.coord for cs in leg.endpoints)
+    return (coord1, coord2) if coord1 <= coord2 else (coord2, coord1)
+
+
 if __name__ == '__main__':
     make_network(input_filepath='created_network/dataset.csv',
                  min_chargers=4,
                  ev_range=700,
                  cluster_diameter=60,
-                 output_filepath='../created_network/network.json')
+                 output_filepath='../created_network/network.json',
+                 leg_cache_filepath='../created_network/leg_cache.json')
@@ -151,7 +151,7 @@ def graph_path(path: list[Leg], display_result: bool = False) -> str:
     temp_net = ChargeNetwork(-1, -1)
     temp_net.add_charge_station(ChargeStation('', '', '', '', 0, 0, datetime.date(2000, 1, 1)), set(path))
 
-    charge_stations = set.union(*(leg.endpoints for leg in path))
+    charge_stations = {cs for leg in path for cs in leg.endpoints}
     for cs in charge_stations:
         temp_net.add_charge_station(cs)
 